@@ -3,7 +3,9 @@
 emulator_full.py — минимальный полнофункциональный эмулятор shell (Stages 1-5)
 
 Запуск:
-  python3 emulator_full.py [--vfs VFS_JSON] [--log LOG_XML] [--start START_SCRIPT] [--config CONFIG_JSON]
+  python3 emulator_full.py [--vfs VFS_JSON] [--log LOG_XML] [--start START_SCRIPT] [--config CONFIG_JSON] [--warmup] [--quiet] [--preload]
+
+Опциональная сборка: `mypyc emu.py` кладёт рядом emu.*.so, и запуск `python3 emu.py` использует его.
 
 Поведение:
  - Значения из CONFIG_JSON имеют приоритет над CLI-параметрами (требование).
@@ -13,37 +15,111 @@ emulator_full.py — минимальный полнофункциональны
  - Поддерживает стартовый скрипт: строки начинающиеся с '#' — комментарии; прочие показываются как ввод (>>> ...), выводится результат.
  - Команды: ls, cd, whoami, rev, head, chown, exit. Unknown -> сообщение об ошибке.
 """
-import argparse, json, base64, os, sys, getpass, datetime, xml.etree.ElementTree as ET
-from typing import Optional, Dict, Any, List
+import atexit, json, base64, mmap, os, re, sys, threading, time, getpass, importlib.util, importlib.machinery
+from typing import Optional, Dict, Any, BinaryIO, Callable, Iterable, List, Mapping, Sequence, Tuple, cast
+from xml.sax.saxutils import escape as xml_escape
+_json_loads: Callable[[Any], Any]
+try:
+    import orjson
+    _json_loads = orjson.loads
+    _JSON_TAKES_BUFFER = True  # orjson parses a memoryview in place
+except ImportError:
+    _json_loads = json.loads
+    _JSON_TAKES_BUFFER = False
+from types import MappingProxyType, SimpleNamespace
 
 # -------------------------
 # VFS node
 # -------------------------
+_NO_CHILDREN: Mapping[str, 'VNode'] = MappingProxyType({})  # shared by all files
+_B64_STRICT_RE = re.compile(r"[A-Za-z0-9+/]*={0,2}")
+
+def is_lazy_b64(b64: str) -> bool:
+    # strict, correctly padded base64 always decodes: it can wait until a command reads it
+    return len(b64) % 4 == 0 and _B64_STRICT_RE.fullmatch(b64) is not None
+
+def _intern(value: Any) -> Any:
+    # the VFS JSON may hold non-string owners or modes (1000, null): those are kept as they are
+    return sys.intern(value) if isinstance(value, str) else value
+
 class VNode:
-    def __init__(self, name: str, ntype: str, owner: str = "root", mode: str = "rw", content: bytes = b""):
+    # no per-instance __dict__: large trees hold many nodes
+    __slots__ = ("name", "type", "owner", "mode", "_content", "_b64", "children", "_sorted_names", "_repr")
+
+    def __init__(self, name: str, ntype: str, owner: Any = "root", mode: Any = "rw",
+                 content_b64: Optional[str] = None):
         self.name = name
         assert ntype in ("dir", "file")
         self.type = ntype
-        self.owner = owner
-        self.mode = mode
-        self.content = content
-        self.children: Dict[str, 'VNode'] = {}  # only for dir
+        # owners and modes come from a handful of values: share one string object each
+        self.owner = _intern(owner)
+        self.mode = _intern(mode)
+        self._content = b""
+        self._b64 = content_b64 or None  # decoded on first access to content
+        self.children: Mapping[str, 'VNode'] = {} if ntype == "dir" else _NO_CHILDREN
+        self._sorted_names: Optional[Tuple[str, ...]] = None  # cached by list_dir
+        self._repr: Optional[str] = None  # cached by repr_line, reset when the owner changes
+
+    @property
+    def content(self) -> bytes:
+        b64 = self._b64  # read once: preload_contents may decode the same node concurrently
+        if b64 is not None:
+            try:
+                content = base64.b64decode(b64)
+            except Exception as e:
+                raise ValueError(f"bad base64 for file {self.name}: {e}")
+            self._content = content
+            self._b64 = None
+            return content
+        return self._content
+
+    def size(self) -> int:
+        b64 = self._b64
+        if b64 is None:
+            return len(self._content)
+        # only strict base64 is left undecoded (see is_lazy_b64): its decoded length follows from its own
+        return len(b64) // 4 * 3 - (2 if b64.endswith("==") else 1 if b64.endswith("=") else 0)
 
     def add_child(self, node: 'VNode'):
         if self.type != "dir":
             raise ValueError("cannot add child to file")
-        self.children[node.name] = node
+        cast(Dict[str, 'VNode'], self.children)[node.name] = node
+        self._sorted_names = None
 
-    def repr_line(self):
-        if self.type == "dir":
-            return f"{self.name}/\t<dir>\towner:{self.owner}"
-        else:
-            return f"{self.name}\t<file>\towner:{self.owner}\tsize:{len(self.content)}"
+    def list_dir(self) -> Tuple[str, ...]:
+        # sorted child names, recomputed only after the directory changes
+        names = self._sorted_names
+        if names is None:
+            names = self._sorted_names = tuple(sorted(self.children))
+        return names
+
+    def set_owner(self, owner: str):
+        self.owner = sys.intern(owner)
+        self._repr = None
+
+    def repr_line(self) -> str:
+        line = self._repr
+        if line is None:
+            if self.type == "dir":
+                line = f"{self.name}/\t<dir>\towner:{self.owner}"
+            else:
+                line = f"{self.name}\t<file>\towner:{self.owner}\tsize:{self.size()}"
+            self._repr = line
+        return line
+
+class VRoot(VNode):
+    # root-only fields live here so that ordinary nodes do not carry their slots
+    __slots__ = ("vfs_name", "_index")
+
+    def __init__(self, vfs_name: str = "VFS", owner: Any = "root", mode: Any = "rw"):
+        super().__init__("/", "dir", owner=owner, mode=mode)
+        self.vfs_name = vfs_name
+        self._index: Dict[str, VNode] = {"/": self}  # absolute path -> node
 
 # -------------------------
 # Build VFS from JSON
 # -------------------------
-def build_vfs_from_json(js: Dict[str,Any]) -> VNode:
+def build_vfs_from_json(js: Dict[str,Any]) -> VRoot:
     """
     Expected format:
     {
@@ -62,189 +138,386 @@ def build_vfs_from_json(js: Dict[str,Any]) -> VNode:
     def make(name: str, obj: Dict[str,Any]) -> VNode:
         t = obj.get("type")
         if t == "dir":
-            node = VNode(name, "dir", owner=obj.get("owner","root"), mode=obj.get("mode","rw"))
-            for child_name, child_def in obj.get("children", {}).items():
-                node.add_child(make(child_name, child_def))
-            return node
+            return VNode(name, "dir", owner=obj.get("owner","root"), mode=obj.get("mode","rw"))
         elif t == "file":
-            b64 = obj.get("content", "")
-            try:
-                content = base64.b64decode(b64) if b64 else b""
-            except Exception as e:
-                raise ValueError(f"bad base64 for file {name}: {e}")
-            return VNode(name, "file", owner=obj.get("owner","root"), mode=obj.get("mode","rw"), content=content)
+            b64 = obj.get("content") or ""
+            if not isinstance(b64, str):
+                raise ValueError(f"bad base64 for file {name}: expected a string, not '{type(b64).__name__}'")
+            node = VNode(name, "file", owner=obj.get("owner","root"), mode=obj.get("mode","rw"),
+                         content_b64=b64)
+            if not is_lazy_b64(b64):
+                node.content  # anything else is decoded now, so a broken string is reported at load
+            return node
         else:
             raise ValueError(f"invalid node type {t} for {name}")
     root_def = js["root"]
-    root = make("/", root_def)
-    root.vfs_name = js.get("name", "VFS")
+    # one handler for the whole walk: a non-object node or "children" value
+    # surfaces as AttributeError/TypeError somewhere inside it
+    try:
+        if root_def.get("type") != "dir":
+            raise ValueError("VFS root must be a directory")
+        root = VRoot(js.get("name", "VFS"), owner=root_def.get("owner","root"), mode=root_def.get("mode","rw"))
+        index = root._index
+        # iterative walk: no recursion limit on deep trees
+        # parent_path is None below a name no path can spell: that subtree is not indexed
+        stack: List[Tuple[VNode, Dict[str, Any], Optional[str]]] = [(root, root_def, "")]
+        while stack:
+            parent, obj, parent_path = stack.pop()
+            for child_name, child_def in obj.get("children", {}).items():
+                child = make(child_name, child_def)
+                parent.add_child(child)
+                child_path: Optional[str] = None
+                if parent_path is not None and child_name not in ("", ".", "..") and "/" not in child_name:
+                    child_path = parent_path + "/" + child_name
+                    index[child_path] = child
+                if child.type == "dir":
+                    stack.append((child, child_def, child_path))
+    except (AttributeError, TypeError) as e:
+        raise ValueError(f"malformed VFS JSON: {e}")
     return root
 
+MMAP_THRESHOLD = 1 << 20  # VFS files from this size on are mapped instead of read
+
+def load_vfs_json(path: str) -> Any:
+    with open(path, "rb") as f:
+        if not _JSON_TAKES_BUFFER or os.fstat(f.fileno()).st_size < MMAP_THRESHOLD:
+            return _json_loads(f.read())
+        # parse straight from the page cache, without a read() copy
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+            return _json_loads(view)
+
+def preload_contents(root: VNode):
+    """
+    Decodes every file that is still base64. Meant for a background thread
+    started before the REPL: decoding overlaps with waiting for input.
+    """
+    nodes = root._index.values() if isinstance(root, VRoot) else [root]
+    for node in nodes:
+        if node._b64 is not None:
+            node.content
+
+def start_preload(root: VNode) -> threading.Thread:
+    t = threading.Thread(target=preload_contents, args=(root,), name="vfs-preload", daemon=True)
+    t.start()
+    return t
+
 # -------------------------
 # Path resolution utilities
 # -------------------------
-def split_path(p: str) -> List[str]:
-    return [x for x in p.strip().split("/") if x != ""]
+def normalize_parts(parts: Iterable[str], base: Sequence[str] = ()) -> List[str]:
+    """Applies the components of parts on top of base, dropping '', '.' and resolving '..'."""
+    stack = list(base)
+    push = stack.append  # bound once, outside the loop
+    pop = stack.pop
+    for p in parts:
+        if p == "..":
+            if stack:
+                pop()
+        elif p and p != ".":
+            push(p)
+    return stack
 
-def resolve_to_node(root: VNode, cwd_parts: List[str], path: str) -> (Optional[VNode], Optional[str]):
+# (node, None, normalized parts) on success, (None, error_msg, None) otherwise
+Resolved = Tuple[Optional[VNode], Optional[str], Optional[Tuple[str, ...]]]
+
+def resolve_to_node(root: VNode, cwd_parts: Sequence[str], path: str,
+                    cwd_node: Optional[VNode] = None) -> Resolved:
     """
-    Returns (node, None) or (None, error_msg).
+    Returns (node, None, parts) or (None, error_msg, None); parts is the
+    normalized absolute location of node, so cd can use it as the new cwd.
     Path supports: absolute (/a/b), relative, ., .. .
+    cwd_node, if given, is the node at cwd_parts; relative paths are then walked from it.
     """
-    if path == "" or path == ".":
-        # return current directory node
-        cur = root
-        for part in cwd_parts:
-            if part not in cur.children:
-                return None, f"cwd broken: {part}"
-            cur = cur.children[part]
-        return cur, None
-    # build parts list
-    if path.startswith("/"):
-        parts = split_path(path)
-    else:
-        parts = cwd_parts + split_path(path)
-    # normalize ., ..
-    stack = []
-    for p in parts:
-        if p == "" or p == ".":
-            continue
-        if p == "..":
-            if stack:
-                stack.pop()
-            continue
-        stack.append(p)
-    # traverse
+    absolute = path.startswith("/")
+    parts = path.strip().split("/")
+    plain = "." not in parts and ".." not in parts
+    if absolute and plain and isinstance(root, VRoot):
+        # canonical absolute paths are a single lookup in the index built with the VFS
+        node = root._index.get(path)
+        if node is not None:
+            return node, None, tuple(path[1:].split("/")) if path != "/" else ()
+    start = root if absolute else cwd_node
+    if start is not None and plain:
+        # fast path: nothing to normalize, walk the dicts directly
+        cur = start
+        names = [p for p in parts if p]
+        for p in names:
+            nxt = cur.children.get(p)
+            if nxt is None:
+                break  # the general path below builds the error message
+            cur = nxt
+        else:
+            return cur, None, (tuple(names) if absolute else tuple(cwd_parts) + tuple(names))
+    # normalize ., ..; relative paths start from cwd
+    stack = normalize_parts(parts, () if absolute else cwd_parts)
+    if isinstance(root, VRoot):
+        # the normalized path is canonical: the index answers it without a walk
+        node = root._index.get("/" + "/".join(stack))
+        if node is not None:
+            return node, None, tuple(stack)
+    # traverse (also builds the error message for paths that do not exist)
     cur = root
     for p in stack:
         if cur.type != "dir":
-            return None, f"not a directory: {'/'.join(stack[:-1])}"
-        if p not in cur.children:
-            return None, f"path not found: {'/' + '/'.join(stack) if stack else '/'}"
-        cur = cur.children[p]
-    return cur, None
+            return None, f"not a directory: {'/'.join(stack[:-1])}", None
+        nxt = cur.children.get(p)
+        if nxt is None:
+            return None, f"path not found: {'/' + '/'.join(stack)}", None
+        cur = nxt
+    return cur, None, tuple(stack)
 
 # -------------------------
 # XML logging
 # -------------------------
-def ensure_xml_log(path: str):
-    if not os.path.exists(path):
-        root = ET.Element("log")
-        tree = ET.ElementTree(root)
-        tree.write(path, encoding="utf-8", xml_declaration=True)
+LOG_HEADER = b"<?xml version='1.0' encoding='utf-8'?>\n<log>\n"
+LOG_CLOSE = b"</log>\n"
+_LOG_TAIL_SCAN = 256  # bytes read from the end of the log to find </log>
+_EMPTY_LOG_RE = re.compile(rb"<log\s*/>")  # empty root as written by ElementTree
 
-def append_xml_event(path: str, user: str, command: str, args: List[str]):
+def _env_int(name: str, default: int) -> int:
     try:
-        ensure_xml_log(path)
-        tree = ET.parse(path)
-        root = tree.getroot()
-        ev = ET.SubElement(root, "event")
-        ev.set("time", datetime.datetime.utcnow().isoformat() + "Z")
-        ev.set("user", user)
-        cmd_el = ET.SubElement(ev, "command"); cmd_el.text = command
-        args_el = ET.SubElement(ev, "args"); args_el.text = " ".join(args)
-        tree.write(path, encoding="utf-8", xml_declaration=True)
-    except Exception as e:
-        print(f"Error writing log: {e}", file=sys.stderr)
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+# events are buffered and flushed every LOG_BATCH events or LOG_FLUSH_MS milliseconds
+LOG_BATCH = max(1, _env_int("EMU_LOG_BATCH", 32))
+LOG_FLUSH_MS = max(0, _env_int("EMU_LOG_MS", 50))
+
+def ensure_xml_log(path: str):
+    # exclusive create: one syscall, and no window between the check and the write
+    try:
+        with open(path, "xb") as f:
+            f.write(LOG_HEADER + LOG_CLOSE)
+    except FileExistsError:
+        pass
+
+_ts_sec = -1
+_ts_prefix = ""
+
+def utc_timestamp() -> str:
+    # same shape as datetime.utcnow().isoformat() + "Z"; the date/time part is formatted once per second
+    global _ts_sec, _ts_prefix
+    sec, ns = divmod(time.time_ns(), 1_000_000_000)
+    if sec != _ts_sec:
+        _ts_sec = sec
+        tm = time.gmtime(sec)
+        _ts_prefix = (f"{tm.tm_year:04d}-{tm.tm_mon:02d}-{tm.tm_mday:02d}"
+                      f"T{tm.tm_hour:02d}:{tm.tm_min:02d}:{tm.tm_sec:02d}.")
+    return f"{_ts_prefix}{ns // 1000:06d}Z"
+
+_EVENT_TEMPLATE = '<event time="{t}" user="{u}"><command>{c}</command><args>{a}</args></event>\n'
+_ATTR_ENTITIES = {'"': "&quot;"}
+
+def xml_attr(value: str) -> str:
+    return xml_escape(value, _ATTR_ENTITIES)
+
+def format_xml_event(user_attr: str, command: str, args: str) -> bytes:
+    # user_attr is already escaped with xml_attr: the emulator does that once per session
+    return _EVENT_TEMPLATE.format(t=utc_timestamp(), u=user_attr, c=xml_escape(command),
+                                  a=xml_escape(args)).encode("utf-8", "backslashreplace")
+
+def _log_insert_point(f) -> Tuple[int, bytes]:
+    """
+    Returns (offset, prefix): where new events go (right before </log>)
+    and what has to be written in front of them.
+    """
+    size = f.seek(0, os.SEEK_END)
+    start = max(0, size - _LOG_TAIL_SCAN)
+    f.seek(start)
+    tail = f.read()
+    pos = tail.rfind(b"</log>")
+    if pos >= 0:
+        return start + pos, b""
+    m = _EMPTY_LOG_RE.search(tail)
+    if m:
+        return start + m.start(), b"<log>\n"
+    raise ValueError("log root element is not closed")
 
 # -------------------------
 # Emulator core
 # -------------------------
+HISTORY_FILE = os.path.join(os.path.expanduser("~"), ".emu_history")
+HISTORY_LENGTH = 1000  # lines kept in HISTORY_FILE
+
+def _save_history(readline: Any):
+    try:
+        readline.write_history_file(HISTORY_FILE)
+    except OSError:
+        pass
+
+def enable_readline():
+    # line editing and history for interactive sessions, where readline exists
+    try:
+        import readline
+    except ImportError:
+        return
+    try:
+        readline.read_history_file(HISTORY_FILE)
+    except OSError:
+        pass
+    readline.set_history_length(HISTORY_LENGTH)
+    atexit.register(_save_history, readline)
+
 class Emulator:
-    def __init__(self, root: VNode, log_path: Optional[str]=None, start_script: Optional[str]=None):
+    def __init__(self, root: VNode, log_path: Optional[str]=None, start_script: Optional[str]=None, quiet: bool=False,
+                 user: Optional[str]=None):
         self.root = root
-        self.vfs_name = getattr(root, "vfs_name", "VFS")
-        self.cwd_parts: List[str] = []  # empty -> root
+        self.vfs_name = root.vfs_name if isinstance(root, VRoot) else "VFS"
+        self.cwd_parts: Tuple[str, ...] = ()  # empty -> root
+        self._cwd_node = root
         self.log_path = log_path
         self.start_script = start_script
-        self.user = getpass.getuser() or "unknown"
+        self.quiet = quiet
+        self.user = user if user is not None else (getpass.getuser() or "unknown")
+        self._log_user_attr = xml_attr(self.user)
+        self._log_buf: List[bytes] = []
+        self._log_last_flush = time.monotonic()
+        # kept open for the session; events go to _log_offset, where </log> currently starts
+        self._log_file: Optional[BinaryIO] = None
+        self._log_offset = 0
+        # time-based flushes keep an interactive log current; scripted runs flush by batch size only
+        self._log_timed = True
+        if log_path:
+            # whatever is still buffered when the interpreter exits, on any path
+            atexit.register(self.close_log)
+        self._prompt = self._build_prompt()
+        # command name -> bound handler(rest); exit is handled in run_command
+        self._dispatch: Dict[str, Callable[[str], str]] = {
+            "ls": self.cmd_ls,
+            "cd": self.cmd_cd,
+            "whoami": self.cmd_whoami,
+            "rev": self.cmd_rev,
+            "head": self.cmd_head,
+            "chown": self.cmd_chown,
+        }
 
-    def prompt(self) -> str:
+    def _build_prompt(self) -> str:
         cur = "/" if not self.cwd_parts else "/" + "/".join(self.cwd_parts)
         return f"[{self.vfs_name}]{cur}$ "
 
-    def log_cmd(self, command: str, args: List[str]):
-        if self.log_path:
-            append_xml_event(self.log_path, self.user, command, args)
+    # rebuilt by cd only
+    def prompt(self) -> str:
+        return self._prompt
+
+    # rest: the argument part of the input line as typed, logged as is
+    def log_cmd(self, command: str, rest: str):
+        if not self.log_path:
+            return
+        try:
+            self._log_buf.append(format_xml_event(self._log_user_attr, command, rest))
+        except Exception as e:
+            # a logging failure never stops the command itself
+            print(f"Error writing log: {e}", file=sys.stderr)
+            return
+        if (len(self._log_buf) >= LOG_BATCH
+                or (self._log_timed and (time.monotonic() - self._log_last_flush) * 1000 >= LOG_FLUSH_MS)):
+            self._flush_log()
+
+    def _flush_log(self):
+        self._log_last_flush = time.monotonic()
+        if not self._log_buf:
+            return
+        data = b"".join(self._log_buf)
+        self._log_buf.clear()
+        try:
+            f = self._log_file
+            if f is None:
+                ensure_xml_log(self.log_path)
+                f = open(self.log_path, "r+b", buffering=0)
+                offset, prefix = _log_insert_point(f)
+                self._log_file, self._log_offset = f, offset
+                data = prefix + data
+            # one write: the new events followed by a fresh closing tag
+            f.seek(self._log_offset)
+            f.write(data + LOG_CLOSE)
+            self._log_offset += len(data)
+        except Exception as e:
+            print(f"Error writing log: {e}", file=sys.stderr)
+            self.close_log()
+
+    def close_log(self):
+        if self._log_buf:
+            self._flush_log()
+        if self._log_file is not None:
+            self._log_file.close()
+            self._log_file = None
+
+    def _resolve(self, path: str) -> Resolved:
+        if path == "" or path == ".":
+            return self._cwd_node, None, self.cwd_parts
+        # absolute paths hit the index, relative ones walk from the cached cwd node: no further memo needed
+        return resolve_to_node(self.root, self.cwd_parts, path, self._cwd_node)
 
-    def run_command(self, command: str, args: List[str]) -> Optional[str]:
+    # handlers get the unsplit argument string and tokenize only as far as they need
+    def run_command(self, command: str, rest: str = "") -> Optional[str]:
         # log
-        self.log_cmd(command, args)
+        self.log_cmd(command, rest)
         # dispatch
         if command == "exit":
+            self._flush_log()
             print("Bye.")
             sys.exit(0)
-        if command == "ls":
-            return self.cmd_ls(args)
-        if command == "cd":
-            return self.cmd_cd(args)
-        if command == "whoami":
-            return self.user
-        if command == "rev":
-            return self.cmd_rev(args)
-        if command == "head":
-            return self.cmd_head(args)
-        if command == "chown":
-            return self.cmd_chown(args)
+        handler = self._dispatch.get(command)
+        if handler is not None:
+            return handler(rest)
         return f"Unknown command: {command}"
 
+    def cmd_whoami(self, rest: str) -> str:
+        return self.user
+
     # ls: if arg given -> list that path, else list cwd
-    def cmd_ls(self, args: List[str]) -> str:
-        path = args[0] if args else ""
-        node, err = resolve_to_node(self.root, self.cwd_parts, path)
+    def cmd_ls(self, rest: str) -> str:
+        path = rest.split(None, 1)[0] if rest else ""
+        node, err, _ = self._resolve(path)
         if node is None:
             return f"ls: {err}"
         if node.type == "file":
             return node.repr_line()
         # directory
-        lines = []
-        for name in sorted(node.children.keys()):
-            lines.append(node.children[name].repr_line())
-        return "\n".join(lines)
+        children = node.children
+        return "\n".join([children[name].repr_line() for name in node.list_dir()])
 
     # cd: change cwd to path or to root if no args
-    def cmd_cd(self, args: List[str]) -> str:
-        if len(args) > 1:
-            return "cd: too many arguments"
-        path = args[0] if args else "/"
-        node, err = resolve_to_node(self.root, self.cwd_parts, path)
-        if node is None:
+    def cmd_cd(self, rest: str) -> str:
+        if not rest:
+            path = "/"
+        else:
+            args = rest.split()
+            if len(args) > 1:
+                return "cd: too many arguments"
+            path = args[0]
+        node, err, parts = self._resolve(path)
+        if node is None or parts is None:
             return f"cd: {err}"
         if node.type != "dir":
             return f"cd: not a directory: {path}"
-        # set cwd_parts
-        if path.startswith("/"):
-            self.cwd_parts = split_path(path)
-        else:
-            parts = self.cwd_parts + split_path(path)
-            stack = []
-            for p in parts:
-                if p == "" or p == ".":
-                    continue
-                if p == "..":
-                    if stack: stack.pop()
-                else:
-                    stack.append(p)
-            self.cwd_parts = stack
+        self.cwd_parts = parts
+        self._cwd_node = node
+        self._prompt = self._build_prompt()
         return ""
 
-    # rev: if argument resolves to file -> reverse file content (decoded), else reverse joined args
-    def cmd_rev(self, args: List[str]) -> str:
-        if not args:
+    # rev: if argument resolves to file -> reverse file content (decoded), else reverse the text as typed
+    def cmd_rev(self, rest: str) -> str:
+        if not rest:
             return ""
-        maybe = args[0]
-        node, err = resolve_to_node(self.root, self.cwd_parts, maybe)
+        maybe = rest.split(None, 1)[0]
+        node, err, _ = self._resolve(maybe)
         if node is not None and node.type == "file":
             try:
-                text = node.content.decode(errors="replace")
-                return text[::-1]
+                data = node.content
+                if data.isascii():
+                    # reversing bytes is the same as reversing text for ASCII
+                    return data[::-1].decode("ascii")
+                return data.decode(errors="replace")[::-1]
             except Exception:
                 return f"rev: cannot decode {maybe}"
         # else treat as string
-        return " ".join(args)[::-1]
+        return rest[::-1]
 
     # head: head [-n N] filename
-    def cmd_head(self, args: List[str]) -> str:
+    def cmd_head(self, rest: str) -> str:
+        args = rest.split()
         if not args:
             return "head: missing file operand"
         n = 10
@@ -258,81 +531,120 @@ class Emulator:
                 return "head: invalid number"
             idx = 2
         filename = args[idx]
-        node, err = resolve_to_node(self.root, self.cwd_parts, filename)
+        node, err, _ = self._resolve(filename)
         if node is None:
             return f"head: {err}"
         if node.type != "file":
             return f"head: {filename}: not a file"
-        text = node.content.decode(errors="replace").splitlines()
+        buf = node.content
+        if n >= 0:
+            # decode only up to the n-th newline instead of the whole file
+            pos = 0
+            for _ in range(n):
+                nxt = buf.find(b"\n", pos)
+                if nxt < 0:
+                    pos = len(buf)
+                    break
+                pos = nxt + 1
+            buf = buf[:pos]
+        text = buf.decode(errors="replace").splitlines()
         return "\n".join(text[:n])
 
     # chown owner path
-    def cmd_chown(self, args: List[str]) -> str:
+    def cmd_chown(self, rest: str) -> str:
+        args = rest.split()
         if len(args) < 2:
             return "chown: usage: chown owner path"
         owner = args[0]
         path = args[1]
-        node, err = resolve_to_node(self.root, self.cwd_parts, path)
+        node, err, _ = self._resolve(path)
         if node is None:
             return f"chown: {err}"
-        node.owner = owner
+        node.set_owner(owner)
         return ""
 
+    # split a line into command and the rest, run it and print the result
+    def run_line(self, line: str):
+        parts = line.split(None, 1)
+        if not parts:
+            return
+        out = self.run_command(parts[0], parts[1].rstrip() if len(parts) > 1 else "")
+        if out is not None and out != "":
+            print(out)
+
     # start-script execution
     def run_start_script(self):
         if not self.start_script:
             return
-        if not os.path.exists(self.start_script):
+        try:
+            f = open(self.start_script, "r", encoding="utf-8")
+        except FileNotFoundError:
             print(f"Start script not found: {self.start_script}")
             return
+        except OSError as e:
+            print(f"Error executing start script: {e}")
+            return
         print(f"--- Executing start script: {self.start_script} ---")
+        self._log_timed = False
         try:
-            with open(self.start_script, "r", encoding="utf-8") as f:
+            with f:
                 for raw in f:
                     line = raw.rstrip("\n")
                     stripped = line.strip()
                     if stripped == "" or stripped.startswith("#"):
                         # show comment or blank as-is
-                        print(line)
+                        if not self.quiet:
+                            print(line)
                         continue
-                    print(f">>> {line}")
-                    parts = stripped.split()
-                    cmd = parts[0]
-                    args = parts[1:]
-                    out = self.run_command(cmd, args)
-                    if out is not None and out != "":
-                        print(out)
+                    if not self.quiet:
+                        print(f">>> {line}")
+                    self.run_line(stripped)
         except Exception as e:
             print(f"Error executing start script: {e}")
+        finally:
+            self._log_timed = True
+            self._flush_log()
 
     # REPL
     def repl(self):
         # execute start script (if any) then REPL
         self.run_start_script()
         try:
-            while True:
-                try:
-                    line = input(self.prompt())
-                except EOFError:
-                    print()  # clean exit on Ctrl-D
-                    break
-                except KeyboardInterrupt:
-                    print()  # ignore Ctrl-C, new line
-                    continue
-                s = line.strip()
-                if not s:
-                    continue
-                parts = s.split()
-                cmd = parts[0]
-                args = parts[1:]
-                out = self.run_command(cmd, args)
-                if out is not None and out != "":
-                    print(out)
+            if sys.stdin.isatty():
+                self._interactive_loop()
+            else:
+                self._piped_loop()
         except SystemExit:
             raise
         except Exception as e:
+            self._flush_log()
             print(f"Unexpected error in REPL: {e}", file=sys.stderr)
 
+    def _interactive_loop(self):
+        enable_readline()
+        while True:
+            try:
+                line = input(self.prompt())
+            except EOFError:
+                self._flush_log()
+                print()  # clean exit on Ctrl-D
+                break
+            except KeyboardInterrupt:
+                self._flush_log()
+                print()  # ignore Ctrl-C, new line
+                continue
+            self.run_line(line)
+
+    # piped/redirected stdin: no prompts, lines are read straight from the buffered stream
+    def _piped_loop(self):
+        self._log_timed = False
+        try:
+            for line in sys.stdin:
+                self.run_line(line)
+        except KeyboardInterrupt:
+            pass
+        self._flush_log()
+
 # -------------------------
 # Config loader and CLI
 # -------------------------
@@ -349,13 +661,33 @@ def load_config(path: str) -> Dict[str, Optional[str]]:
         print(f"Error reading config file {path}: {e}", file=sys.stderr)
         return {}
 
-def main():
+WARMUP_ROUNDS = 100
+
+def warmup(root: VNode, rounds: int = WARMUP_ROUNDS):
+    # let the interpreter specialize the path code before the first real command
+    for _ in range(rounds):
+        resolve_to_node(root, (), "/")
+        resolve_to_node(root, (), "./..")
+
+def parse_args(argv: List[str]) -> Any:
+    if not argv:
+        # nothing to parse: skip importing and building argparse
+        return SimpleNamespace(vfs=None, log=None, start=None, config=None,
+                               warmup=False, quiet=False, preload=False)
+    import argparse
     ap = argparse.ArgumentParser(description="Minimal emulator stages1-5")
     ap.add_argument("--vfs", help="VFS JSON file", default=None)
     ap.add_argument("--log", help="log XML file", default=None)
     ap.add_argument("--start", help="start script file", default=None)
     ap.add_argument("--config", help="config JSON file (overrides CLI)", default=None)
-    args = ap.parse_args()
+    ap.add_argument("--warmup", help="pre-run path resolution before the REPL", action="store_true")
+    ap.add_argument("--quiet", help="do not echo start script lines", action="store_true")
+    ap.add_argument("--preload", help="decode VFS file contents in the background", action="store_true")
+    return ap.parse_args(argv)
+
+def main():
+    args = parse_args(sys.argv[1:])
+    user = getpass.getuser() or "unknown"
 
     cli = {"vfs": args.vfs, "log": args.log, "start": args.start}
     cfg = {}
@@ -376,34 +708,26 @@ def main():
 
     # load VFS
     if vfs_path:
-        if not os.path.exists(vfs_path):
+        try:
+            root = build_vfs_from_json(load_vfs_json(vfs_path))
+        except FileNotFoundError:
             print(f"Error: VFS file not found: {vfs_path}", file=sys.stderr)
             # fallback empty root
-            root = VNode("/", "dir")
-            root.vfs_name = "VFS"
-        else:
-            try:
-                with open(vfs_path, "r", encoding="utf-8") as f:
-                    j = json.load(f)
-                    root = build_vfs_from_json(j)
-            except Exception as e:
-                print(f"Error loading VFS from {vfs_path}: {e}", file=sys.stderr)
-                root = VNode("/", "dir")
-                root.vfs_name = "VFS"
+            root = VRoot()
+        except Exception as e:
+            print(f"Error loading VFS from {vfs_path}: {e}", file=sys.stderr)
+            root = VRoot()
     else:
-        root = VNode("/", "dir")
-        root.vfs_name = "VFS"
+        root = VRoot()
 
     # prepare log file
     if log_path:
         try:
             ensure_dir = os.path.dirname(log_path)
-            if ensure_dir and not os.path.exists(ensure_dir):
+            if ensure_dir:
                 os.makedirs(ensure_dir, exist_ok=True)
             # ensure file exists
-            if not os.path.exists(log_path):
-                root_el = ET.Element("log")
-                ET.ElementTree(root_el).write(log_path, encoding="utf-8", xml_declaration=True)
+            ensure_xml_log(log_path)
         except Exception as e:
             print(f"Error preparing log file {log_path}: {e}", file=sys.stderr)
 
@@ -413,11 +737,22 @@ def main():
     print(f"Log file: {log_path}")
     print(f"Start script: {start_script}")
     print(f"Config file used: {args.config}")
-    print(f"User: {getpass.getuser()}")
+    print(f"User: {user}")
     print("=================================")
 
-    em = Emulator(root, log_path, start_script)
+    if args.warmup:
+        warmup(root)
+    if args.preload:
+        start_preload(root)
+    em = Emulator(root, log_path, start_script, quiet=args.quiet, user=user)
     em.repl()
 
+def _compiled_main() -> Callable[[], None]:
+    # main() of the mypyc-built extension next to this file, if there is one
+    spec = importlib.util.find_spec("emu")
+    if spec is not None and spec.origin and spec.origin.endswith(tuple(importlib.machinery.EXTENSION_SUFFIXES)):
+        return importlib.import_module("emu").main
+    return main
+
 if __name__ == "__main__":
-    main()
+    _compiled_main()()